@@ -1,9 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 from json_repair import repair_json
-from litellm import completion as llm_completion, batch_completion as llm_batch_completion
-import copy
+import orjson
+from pydantic import BaseModel
+from litellm import acompletion as llm_acompletion, batch_completion as llm_batch_completion
+
+from prompts import agent_system_prompt,agent_system_prompt_with_user_preferences,reflective_agent_system_prompt_preamble,update_agent_notes_prompt,proper_scaffolding_prompt_no_json,summarize_conversation_prompt
+
+
+# All LLM calls run on a single long-lived event loop so that concurrent requests (from
+# several Streamlit sessions, or fanned out within one call) overlap their network wait.
+_event_loop = None
+_event_loop_lock = threading.Lock()
+
+
+def _get_event_loop():
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, name="collaborator-agent-loop", daemon=True).start()
+    return _event_loop
+
+
+def submit(coro):
+    """Schedule a coroutine on the shared agent event loop, returning a concurrent.futures.Future for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop())
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared agent event loop and block until it finishes."""
+    return submit(coro).result()
+
+
+def iterate_sync(async_iterator):
+    """Iterate an async generator from synchronous code, stepping it on the shared agent event loop."""
+    try:
+        while True:
+            try:
+                yield run_sync(async_iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(async_iterator.aclose())
+
+
+# File writes happen off the calling thread; a single worker keeps writes to the same file in order
+_file_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="collaborator-agent-writer")
+
+
+def _append_file_durable(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class IncompleteResponseError(Exception):
+    """Raised by astream_collaborator_response when the reply stopped before its "response" field was complete."""
+
+
+# Retry hedging for collaborator responses, see agenerate_collaborator_response
+SPECULATIVE_ATTEMPTS = 2
+HEDGE_DELAY_SECONDS = 30
+
+# Most responses an agent keeps in memory, least recently used are evicted first
+RESPONSE_CACHE_SIZE = 256
+
+
+def compile_prompt(template):
+    """Split a str.format template once, returning a function that fills it in by concatenation."""
+    literals, fields = [""], []
+    for literal_text, field_name, format_spec, conversion in string.Formatter().parse(template):
+        literals[-1] += literal_text
+        if field_name is not None:
+            if conversion:
+                raise ValueError(f"Conversions are not supported in prompt templates: {{{field_name}!{conversion}}}")
+            fields.append((field_name, format_spec))
+            literals.append("")
+
+    def fill(**values):
+        parts = [literals[0]]
+        for (field_name, format_spec), literal in zip(fields, literals[1:]):
+            parts.append(format(values[field_name], format_spec))
+            parts.append(literal)
+        return "".join(parts)
+
+    return fill
 
-from prompts import agent_system_prompt,agent_system_prompt_with_user_preferences,reflective_agent_system_prompt,update_agent_notes_prompt,proper_scaffolding_prompt
 
+# Prompts filled in on every request, split once at import
+fill_proper_scaffolding_prompt = compile_prompt(proper_scaffolding_prompt_no_json)
+fill_update_agent_notes_prompt = compile_prompt(update_agent_notes_prompt)
+fill_summarize_conversation_prompt = compile_prompt(summarize_conversation_prompt)
+MAX_NEW_TOKENS = 2048
+# Static part of the notes-based system prompt; only the <NOTES> block after it differs between agents
+STATIC_PREAMBLE = reflective_agent_system_prompt_preamble.format(max_new_tokens=MAX_NEW_TOKENS)
+
+NOTES_SCAFFOLDING_PREFIX = "Remember, you have been taking notes throughout past conversations about user preferences. Use whatever is relevant in these notes to guide your response:\n"
+RELEVANT_NOTES_SCAFFOLDING_PREFIX = "Remember, you have been taking notes throughout past conversations about user preferences. Use these notes to guide your response:\n"
+
+
+# Output schemas passed to litellm as response_format, mirroring the output formats in prompts.py
+class CollaboratorResponse(BaseModel):
+    reasoning: str
+    response: str
+
+
+class UserPreferencesCollaboratorResponse(BaseModel):
+    user_preference_1: str
+    user_preference_2: str
+    user_preference_3: str
+    reasoning: str
+    response: str
+
+
+class ReflectiveCollaboratorResponse(BaseModel):
+    user_preferences_reasoning: str
+    reasoning: str
+    response: str
+
+
+class AgentNotesUpdate(BaseModel):
+    user_preferences_reasoning: str
+    agent_notes: str
+
+
+def parse_json_response(response):
+    """Parse a JSON model response, only falling back to json_repair when it is not already valid JSON."""
+    try:
+        processed_response = orjson.loads(response.strip().removeprefix("```json").removesuffix("```"))
+        if isinstance(processed_response, dict):
+            return processed_response
+    except orjson.JSONDecodeError:
+        pass
+    return repair_json(response, return_objects=True)
+
+
+def extract_tagged_text(response, tag):
+    """Return the text between <tag> and </tag> in a plain-text model response, or None if a tag is missing."""
+    _, start_tag, text = (response or "").partition(f"<{tag}>")
+    text, end_tag, _ = text.partition(f"</{tag}>")
+    if not start_tag or not end_tag:
+        return None
+    return text.strip()
+
+
+class StreamingJSONStringField():
+    """Incrementally decodes the string value of one key from a JSON object that arrives in chunks."""
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+    _PLAIN_RUN = re.compile(r'[^"\\]+')
+
+    def __init__(self, key):
+        self._value_start = re.compile(r'(?<!\\)"%s"\s*:\s*"' % re.escape(key))
+        self._buffer = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, chunk):
+        """Add a chunk of raw model output and return the newly decoded part of the value."""
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._value_start.search(self._buffer)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        buffer, pos, decoded = self._buffer, self._pos, []
+        while pos < len(buffer):
+            plain_run = self._PLAIN_RUN.match(buffer, pos)
+            if plain_run:
+                decoded.append(plain_run.group())
+                pos = plain_run.end()
+                continue
+            if buffer[pos] == '"':
+                self.done = True
+                pos += 1
+                break
+
+            # Escape sequence; stop and wait for more output if it is cut off mid-sequence
+            if pos + 1 >= len(buffer):
+                break
+            escape = buffer[pos + 1]
+            if escape != "u":
+                decoded.append(self._ESCAPES.get(escape, escape))
+                pos += 2
+                continue
+            if pos + 6 > len(buffer):
+                break
+            try:
+                code_point = int(buffer[pos + 2:pos + 6], 16)
+            except ValueError:
+                decoded.append(buffer[pos + 2:pos + 6])
+                pos += 6
+                continue
+            if 0xD800 <= code_point < 0xDC00:
+                # High surrogate, combine with the low surrogate that follows
+                if pos + 12 > len(buffer):
+                    break
+                try:
+                    low_surrogate = int(buffer[pos + 8:pos + 12], 16) if buffer[pos + 6:pos + 8] == "\\u" else None
+                except ValueError:
+                    low_surrogate = None
+                if low_surrogate is not None and 0xDC00 <= low_surrogate < 0xE000:
+                    code_point = 0x10000 + ((code_point - 0xD800) << 10) + (low_surrogate - 0xDC00)
+                    pos += 6
+            decoded.append(chr(code_point))
+            pos += 6
+
+        self._pos = pos
+        return "".join(decoded)
 
 
 class CollaboratorAgent():
@@ -16,31 +234,93 @@ class CollaboratorAgent():
         with_proper_scaffolding=False,
         api_base=None,
         api_key=None,
-        num_retries=20
+        num_retries=20,
+        checkpoint_path=None
     ):
         self.num_retries = num_retries
+        self.checkpoint_path = checkpoint_path
         self.model_name = model_name
         self.user_preferences = user_preferences
         self.agent_notes = agent_notes
         self.with_scaffolding = with_scaffolding
         self.with_proper_scaffolding = with_proper_scaffolding
-        self.max_new_tokens = max_new_tokens = 2048
+        self.max_new_tokens = max_new_tokens = MAX_NEW_TOKENS
         self.kwargs = {"temperature": 0.7, "max_tokens": max_new_tokens, "timeout": 2100}
         if api_base and api_key:
             self.kwargs["api_base"] = api_base
             self.kwargs["api_key"] = api_key
 
         if agent_notes:
-            self.system_prompt = reflective_agent_system_prompt.format(max_new_tokens=max_new_tokens, agent_notes=agent_notes)
+            self.system_prompt = f"{STATIC_PREAMBLE}\n<NOTES>\n{agent_notes}\n</NOTES>\n"
+            self.response_format = ReflectiveCollaboratorResponse
         elif user_preferences:
             self.system_prompt = agent_system_prompt_with_user_preferences.format(max_new_tokens=max_new_tokens, user_preferences=user_preferences)
+            self.response_format = UserPreferencesCollaboratorResponse
         else:
             self.system_prompt = agent_system_prompt.format(max_new_tokens=max_new_tokens)
+            self.response_format = CollaboratorResponse
+        self._sys_msg = {"role": "system", "content": self.system_prompt}
+
+        # The scaffolding notes go in their own system message after the system prompt, so the system prompt stays
+        # an identical prefix across turns and can hit the provider's prompt cache
+        if with_scaffolding and not with_proper_scaffolding:
+            self.scaffolding_message = {"role": "system", "content": f"{NOTES_SCAFFOLDING_PREFIX}{agent_notes}"}
+
+        # Validated responses to requests whose output is reused as-is (e.g. scaffolding), keyed by _cache_key.
+        # With a checkpoint_path every validated response is also appended there, and replayed on startup so a
+        # restarted session does not pay for the same requests again. Sampled responses are keyed by session_id
+        # as well, so they are only ever replayed to the session that produced them. Entries are tagged with the
+        # agent's fingerprint so an agent only replays the ones it wrote itself.
+        self._fingerprint = hashlib.sha256(f"{model_name}\n{self.system_prompt}".encode("utf-8")).hexdigest()[:16]
+        self._resp_cache = OrderedDict()
+        self._inflight = {}
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        line = b"\n"
+        with open(self.checkpoint_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # A crash mid-append can leave a truncated last line
+                    continue
+                if not isinstance(entry, dict) or entry.get("agent") != self._fingerprint:
+                    continue
+                if "key" not in entry or "response" not in entry:
+                    continue
+                self._cache_response(entry["key"], entry["response"])
+        if not line.endswith(b"\n"):
+            # Terminate the truncated line so the next entry starts on its own line
+            _append_file_durable(self.checkpoint_path, b"\n")
+
+    def _cached_response(self, cache_key):
+        response = self._resp_cache.get(cache_key)
+        if response is not None:
+            self._resp_cache.move_to_end(cache_key)
+        return response
+
+    def _cache_response(self, cache_key, response):
+        self._resp_cache[cache_key] = response
+        self._resp_cache.move_to_end(cache_key)
+        if len(self._resp_cache) > RESPONSE_CACHE_SIZE:
+            self._resp_cache.popitem(last=False)
+
+    def _store_response(self, cache_key, response):
+        if self._resp_cache.get(cache_key) == response:
+            # Served from the cache or by a coalesced call, so it is already checkpointed
+            return
+        self._cache_response(cache_key, response)
+        if self.checkpoint_path:
+            entry = {"key": cache_key, "agent": self._fingerprint, "response": response, "ts": time.time()}
+            entry = orjson.dumps(entry) + b"\n"
+            _file_writer.submit(_append_file_durable, self.checkpoint_path, entry)
 
     def get_conversation_string(self, messages):
         return "\n".join([f"{message['role'].capitalize()}: {message['content']}" for message in messages])
 
-    def completion(self, messages):
+    def validate_messages(self, messages):
         # Validate messages before sending to avoid Together AI input validation errors
         validated_messages = []
         for msg in messages:
@@ -55,77 +335,249 @@ class CollaboratorAgent():
         if not validated_messages:
             raise ValueError("No valid messages to send to the model")
         
-        response = llm_completion(model=self.model_name, messages=validated_messages, num_retries=self.num_retries, **self.kwargs).choices[0].message.content
-        return response
+        return validated_messages
+
+    def _cache_key(self, messages, session_id=None):
+        return hashlib.sha256(json.dumps({"m": self.model_name, "msgs": messages, "t": self.kwargs["temperature"], "s": session_id}, sort_keys=True).encode()).hexdigest()
+
+    async def _llm_acompletion(self, messages, response_format, temperature=None):
+        kwargs = self.kwargs if temperature is None else {**self.kwargs, "temperature": temperature}
+        response = await llm_acompletion(model=self.model_name, messages=messages, num_retries=self.num_retries, response_format=response_format, **kwargs)
+        return response.choices[0].message.content
 
-    def add_scaffolding_to_conversation(self, messages):
+    async def acompletion(self, messages, cache_key=None, response_format=None, temperature=None):
+        validated_messages = self.validate_messages(messages)
+        if cache_key is None:
+            return await self._llm_acompletion(validated_messages, response_format, temperature)
+
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        # Identical cacheable requests that are already in flight share a single LLM call
+        if cache_key in self._inflight:
+            return await asyncio.shield(self._inflight[cache_key])
+
+        task = asyncio.ensure_future(self._llm_acompletion(validated_messages, response_format))
+        self._inflight[cache_key] = task
+        # Cleared when the call itself finishes, not when a waiter is cancelled, so the shielded call stays shared
+        task.add_done_callback(lambda done_task: self._drop_inflight(cache_key, done_task))
+        return await asyncio.shield(task)
+
+    def _drop_inflight(self, cache_key, task):
+        if self._inflight.get(cache_key) is task:
+            del self._inflight[cache_key]
+
+    async def add_scaffolding_to_conversation(self, messages):
         if not self.with_proper_scaffolding:
-            messages[0]["content"] = f"Remember, you have been taking notes throughout past conversations about user preferences. Use whatever is relevant in these notes to guide your response:\n{self.agent_notes}" + messages[0]["content"]
-            return messages
+            return [self.scaffolding_message] + messages
         else:
             conversation_str = self.get_conversation_string(messages)
-            formatted_proper_scaffolding_prompt = proper_scaffolding_prompt.format(conversation_history=conversation_str, complete_agent_notes=self.agent_notes)
+            formatted_proper_scaffolding_prompt = fill_proper_scaffolding_prompt(conversation_history=conversation_str, complete_agent_notes=self.agent_notes)
             scaffolding_messages = [{"role": "user", "content": formatted_proper_scaffolding_prompt}]
+            # Scaffolding is meant to be deterministic for a given conversation, so a validated response is reused
+            cache_key = self._cache_key(scaffolding_messages)
 
-            for _ in range(self.num_retries):
-                scaffolding_response = self.completion(scaffolding_messages)
+            for attempt in range(self.num_retries):
+                try:
+                    scaffolding_response = await self.acompletion(scaffolding_messages, cache_key=cache_key)
 
-                processed_scaffolding_response = repair_json(scaffolding_response, return_objects=True)
-                missing_keys = [key for key in ["reasoning", "relevant_notes"] if key not in processed_scaffolding_response]
-                if missing_keys:
-                    print(f"Missing keys: {missing_keys}. Processed scaffolding response: {processed_scaffolding_response}")
-                    continue
+                    # The notes come back as plain text between <notes> tags, no JSON parsing needed
+                    scaffolded_notes = extract_tagged_text(scaffolding_response, "notes")
+                    if scaffolded_notes is None:
+                        print(f"Missing <notes> tags. Scaffolding response: {scaffolding_response}")
+                        continue
 
-                scaffolded_notes = processed_scaffolding_response["relevant_notes"]
-                messages[0]["content"] = f"Remember, you have been taking notes throughout past conversations about user preferences. Use these notes to guide your response:\n{scaffolded_notes}" + messages[0]["content"]
+                    self._store_response(cache_key, scaffolding_response)
+                    scaffolding_message = {"role": "system", "content": f"{RELEVANT_NOTES_SCAFFOLDING_PREFIX}{scaffolded_notes}"}
 
-                return messages
+                    return [scaffolding_message] + messages
+                except Exception as e:
+                    print(f"Scaffolding attempt {attempt + 1}/{self.num_retries} failed with error: {e}")
 
-    def generate_collaborator_response(self, conversation):
-        conversation = copy.deepcopy(conversation)
-        for attempt in range(self.num_retries):
-            try:
-                if self.with_scaffolding:
-                    conversation = self.add_scaffolding_to_conversation(conversation)
+            print(f"Failed to scaffold conversation after {self.num_retries} retries")
+            return None
 
-                messages = [{"role": "system", "content": self.system_prompt}] + conversation
+    async def _build_messages(self, conversation):
+        # Scaffolding only depends on the conversation, so it is computed once rather than on every retry.
+        # A response without the agent notes would change the study condition, so failing to scaffold is an error
+        if self.with_scaffolding:
+            conversation = await self.add_scaffolding_to_conversation(conversation)
+            if conversation is None:
+                raise RuntimeError(f"Failed to scaffold conversation after {self.num_retries} retries")
 
-                response = self.completion(messages)
+        return [self._sys_msg, *conversation]
 
-                processed_response = repair_json(response, return_objects=True)
-                missing_keys = [key for key in ["reasoning", "response"] if key not in processed_response]
-                if missing_keys:
-                    print(f"Missing keys: {missing_keys}. Messages: {messages}.\n\nResponse: {response}.\n\nProcessed response: {processed_response}")
+    async def agenerate_collaborator_response(self, conversation, session_id=None):
+        messages = await self._build_messages(conversation)
+        cache_key = self._cache_key(messages, session_id) if self.checkpoint_path else None
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return parse_json_response(cached)
+
+        async def attempt(attempt_index):
+            # Raise the temperature a little on each retry so repeated attempts don't fail the same way
+            temperature = min(round(self.kwargs["temperature"] + 0.1 * attempt_index, 2), 1.0)
+            response = await self.acompletion(messages, response_format=self.response_format, temperature=temperature)
+
+            processed_response = parse_json_response(response)
+            missing_keys = [key for key in self.response_format.model_fields if key not in processed_response]
+            if missing_keys:
+                print(f"Missing keys: {missing_keys}. Messages: {messages}.\n\nResponse: {response}.\n\nProcessed response: {processed_response}")
+                return None
+            return response, processed_response
+
+        # Attempts run one at a time, but if one is still unanswered after HEDGE_DELAY_SECONDS a speculative
+        # attempt is started alongside it (up to SPECULATIVE_ATTEMPTS in flight). The first valid response wins.
+        attempt_indices = {}
+        pending = set()
+        last_error = None
+        try:
+            while True:
+                if not pending and len(attempt_indices) < self.num_retries:
+                    task = asyncio.ensure_future(attempt(len(attempt_indices)))
+                    attempt_indices[task] = len(attempt_indices)
+                    pending.add(task)
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, timeout=HEDGE_DELAY_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if len(pending) < SPECULATIVE_ATTEMPTS and len(attempt_indices) < self.num_retries:
+                        task = asyncio.ensure_future(attempt(len(attempt_indices)))
+                        attempt_indices[task] = len(attempt_indices)
+                        pending.add(task)
                     continue
-                return processed_response
-            except Exception as e:
-                print(f"Attempt {attempt + 1}/{self.num_retries} failed with error: {e}")
-                # Log message details for debugging
-                print(f"Conversation length: {len(conversation)}, Total chars: {sum(len(str(m.get('content', ''))) for m in conversation)}")
-                if attempt == self.num_retries - 1:
-                    raise  # Re-raise on last attempt
+
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        print(f"Attempt {attempt_indices[task] + 1}/{self.num_retries} failed with error: {e}")
+                        # Log message details for debugging
+                        print(f"Conversation length: {len(conversation)}, Total chars: {sum(len(str(m.get('content', ''))) for m in conversation)}")
+                        last_error = e
+                        continue
+                    last_error = None
+                    if result is not None:
+                        response, processed_response = result
+                        if cache_key is not None:
+                            self._store_response(cache_key, response)
+                        return processed_response
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_error is not None:
+            raise last_error  # Re-raise when the last attempt failed with an error
 
         print(f"Failed to generate collaborator response after {self.num_retries} retries")
         return None
 
-    def update_agent_notes(self, agent_notes, conversation):
+    async def astream_collaborator_response(self, conversation, session_id=None):
+        """Yield the text of the collaborator's "response" field as it is generated"""
+        messages = await self._build_messages(conversation)
+        cache_key = self._cache_key(messages, session_id) if self.checkpoint_path else None
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            yield parse_json_response(cached)["response"]
+            return
+
+        response_field = StreamingJSONStringField("response")
+        streamed_any = False
+        response = ""
+        stream_error = None
+        try:
+            stream = await llm_acompletion(model=self.model_name, messages=self.validate_messages(messages), num_retries=self.num_retries, response_format=self.response_format, stream=True, **self.kwargs)
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content or ""
+                response += delta
+                text = response_field.feed(delta)
+                if text:
+                    streamed_any = True
+                    yield text
+        except Exception as e:
+            print(f"Streaming collaborator response failed with error: {e}")
+            stream_error = e
+
+        if streamed_any:
+            # Part of the reply is already with the caller, so it can't be quietly swapped for a retried one
+            if not response_field.done:
+                raise IncompleteResponseError(f"Response stream ended before the response was complete: {stream_error or 'stream closed'}")
+            if cache_key is not None:
+                self._store_response(cache_key, response)
+            return
+
+        # Nothing usable was streamed, fall back to the non-streaming path and its retries
+        processed_response = parse_json_response(response) if response else {}
+        if "response" not in processed_response:
+            processed_response = await self.agenerate_collaborator_response(conversation, session_id)
+        if not processed_response or "response" not in processed_response:
+            raise IncompleteResponseError("Failed to generate a collaborator response")
+        yield processed_response["response"]
+
+    def generate_collaborator_response(self, conversation, session_id=None):
+        return run_sync(self.agenerate_collaborator_response(conversation, session_id))
+
+    def generate_collaborator_response_stream(self, conversation, session_id=None):
+        yield from iterate_sync(self.astream_collaborator_response(conversation, session_id))
+
+    async def aupdate_agent_notes(self, agent_notes, conversation, session_id=None):
         conversation_str = self.get_conversation_string(conversation)
-        formatted_update_agent_notes_prompt = update_agent_notes_prompt.format(agent_notes=agent_notes, conversation_str=conversation_str)
+        formatted_update_agent_notes_prompt = fill_update_agent_notes_prompt(agent_notes=agent_notes, conversation_str=conversation_str)
+
+        messages = [{"role": "user", "content": formatted_update_agent_notes_prompt}]
+        cache_key = self._cache_key(messages, session_id) if self.checkpoint_path else None
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return parse_json_response(cached)
 
         for _ in range(self.num_retries):
             try:
-                messages = [{"role": "user", "content": formatted_update_agent_notes_prompt}]
-                response = self.completion(messages)
+                response = await self.acompletion(messages, response_format=AgentNotesUpdate)
                 
-                processed_response = repair_json(response, return_objects=True)
+                processed_response = parse_json_response(response)
 
-                missing_keys = [key for key in ["user_preferences_reasoning", "agent_notes"] if key not in processed_response]
+                missing_keys = [key for key in AgentNotesUpdate.model_fields if key not in processed_response]
                 if missing_keys:
                     print(f"Missing keys: {missing_keys}. Processed response: {processed_response}")
                     continue
 
+                if cache_key is not None:
+                    self._store_response(cache_key, response)
                 return processed_response
             except Exception as e:
                 print(f"Failed to update agent notes: {e}")
 
-        return None
\ No newline at end of file
+        return None
+
+    def update_agent_notes(self, agent_notes, conversation, session_id=None):
+        return run_sync(self.aupdate_agent_notes(agent_notes, conversation, session_id))
+
+    def submit_update_agent_notes(self, agent_notes, conversation, session_id=None):
+        # Starts the update in the background; call .result() on the returned future to get update_agent_notes' result
+        return submit(self.aupdate_agent_notes(agent_notes, conversation, session_id))
+
+    async def asummarize_conversation(self, previous_summary, conversation):
+        conversation_str = self.get_conversation_string(conversation)
+        formatted_summarize_conversation_prompt = fill_summarize_conversation_prompt(previous_summary=previous_summary or "None yet.", conversation_str=conversation_str)
+        messages = [{"role": "user", "content": formatted_summarize_conversation_prompt}]
+
+        for _ in range(self.num_retries):
+            try:
+                response = await self.acompletion(messages)
+
+                summary = extract_tagged_text(response, "summary")
+                if summary is None:
+                    print(f"Missing <summary> tags. Response: {response}")
+                    continue
+
+                return summary
+            except Exception as e:
+                print(f"Failed to summarize conversation: {e}")
+
+        return None
+
+    def submit_summarize_conversation(self, previous_summary, conversation):
+        # Starts the summary in the background; call .result() on the returned future to get the summary (or None)
+        return submit(self.asummarize_conversation(previous_summary, conversation))
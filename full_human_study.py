@@ -5,122 +5,31 @@ Sample run command:
 
 import streamlit as st
 import time
-import json
 import uuid
+import hashlib
+import functools
+import orjson
 import os
+from collections import deque
 from datetime import datetime
 
-from collaborator_agent import CollaboratorAgent
+from prompts import AGENT_PROMPT_VERSION
+from study_conditions import STUDY_CONDITIONS
 
 
-# ============================================================================
-# STUDY CONFIGURATIONS
-# ============================================================================
-
-
-CODING_PREFERENCES = [
-    "When an agent is writing code or explaining a programming concept, you prefer responses that begin with pseudocode (e.g., high-level idea, design rationale) before showing going into implementation details.",
-    "If multiple high-level, valid solutions exist for a coding problem (recursion vs. dynamic programming), then you would prefer the agent to present the different approaches and their tradeoffs.",
-    "If the code solution requires extensive use of an imported library, the agent should always provide an explanation detailing why the dependency is helpful.",
-    "When writing variable names, function names, or method names, you prefer that the agent consistently use camelCase rather than other naming conventions."
-]
-
-CODING_PROBLEMS = [
-    {
-        "id": "p1",
-        "title": "Session 1",
-        "description": """**Problem #1:**
-
-The function below is intended to walk a directory tree and collect files whose names match a pattern. It always returns an empty list. Can you fix it and/or find a cleaner way to implement it?
-
-```python
-import os
-
-def scan_dir(path, pattern):
-    curr_results = []
-    for root, dirs, files in os.walk(path):
-        for f in files:
-            if f.endswith(pattern):
-                curr_results = curr_results.append(os.path.join(root, f))
-    return curr_results
-```
-"""
-    },
-    {
-        "id": "p2",
-        "title": "Session 2",
-        "description": "Write a function that resizes an image, converts it to grayscale, and saves it."
-    },
-    {
-        "id": "p3",
-        "title": "Session 3",
-        "description": "You are implementing an object-oriented program to help students plan their coursework each semester. Your program must support checking whether a student has completed all prerequisites for a course, where some prerequisites include a minimum completion date. You should use the `dateutil` library to parse and compare dates."
-    }
-]
-
-MIXED_PREFERENCES = [
-    "When producing an answer, you prefer responses that begin with a high-level plan before showing concrete revisions, implementations, solutions, or rewritten text. This plan should outline the conceptual strategy, structural intent, and major steps the agent will take.",
-    "If multiple high-level, valid strategies exist for completing a task, you prefer that the agent first present these different approaches along with their tradeoffs. The agent should briefly explain how each strategy would shape the outcome and then ask which direction you want to pursue before producing any detailed edits or solutions."
-]
-
-MIXED_PROBLEMS = [
-    {
-        "id": "p1",
-        "title": "Session 1",
-        "description": """Add a plot twist to the paragraph below, but make sure the twist (e.g., character-based, setting-based, or perspective-based) integrates smoothly with the existing setup. The twist should feel motivated rather than sudden or random.
-
-`Nora stood waiting at the empty bus stop, the cold wind tugging at her coat as she checked the time again. The streetlamps flickered in uneven intervals, casting long shadows across the pavement. Behind her, the small bakery she had just left was closing for the night, its warm lights dimming one by one. The bus was already ten minutes late, and the neighborhood felt unusually deserted for a Thursday evening.`"""
-    },
-    {
-        "id": "p2",
-        "title": "Session 2",
-        "description": "How many ways are there to put 4 distinguishable balls into 2 indistinguishable boxes?"
-    },
-    {
-        "id": "p3",
-        "title": "Session 3",
-        "description": "Write a function that resizes an image, converts it to grayscale, and saves it."
-    }
-]
-
-# Study condition configurations
-STUDY_CONDITIONS = {
-    "coding_standard_agent": {
-        "name": "Coding Study - Version A",
-        "description": "You will be solving debugging, implementation, and object-oriented design problems.",
-        "uses_memory": False,
-        "preferences": CODING_PREFERENCES,
-        "problems": CODING_PROBLEMS
-    },
-    "coding_collaborative_agent": {
-        "name": "Coding Study - Version B",
-        "description": "You will be solving debugging, implementation, and object-oriented design problems.",
-        "uses_memory": True,
-        "preferences": CODING_PREFERENCES,
-        "problems": CODING_PROBLEMS
-    },
-    "mixed_standard_agent": {
-        "name": "Mixed Domains Study - Version A",
-        "description": "You will be solving a writing, math, and coding problems.",
-        "uses_memory": False,
-        "preferences": MIXED_PREFERENCES,
-        "problems": MIXED_PROBLEMS
-    },
-    "mixed_collaborative_agent": {
-        "name": "Mixed Domains Study - Version B",
-        "description": "You will be solving a writing, math, and coding problems.",
-        "uses_memory": True,
-        "preferences": MIXED_PREFERENCES,
-        "problems": MIXED_PROBLEMS
-    }
-}
-
 # ============================================================================
 # API CONFIGURATION
 # ============================================================================
 
 MODEL_NAME = "together_ai/meta-llama/Llama-3.3-70B-Instruct-Turbo"
 
+# With SUMMARIZE_CONTEXT on, only the most recent MAX_CONTEXT_TURNS messages are guaranteed to be sent verbatim;
+# once SUMMARY_EVERY more have accumulated, the older ones are folded into a running summary in the background.
+# Off by default: it changes what the agent sees in every condition, so only enable it for a new study run
+SUMMARIZE_CONTEXT = False
+MAX_CONTEXT_TURNS = 12
+SUMMARY_EVERY = 10
+
 try:
     api_key = st.secrets["TOGETHER_API_KEY"]
 except (FileNotFoundError, KeyError):
@@ -129,47 +38,102 @@ except (FileNotFoundError, KeyError):
         st.error("⚠️ API key not found. Please configure TOGETHER_API_KEY in secrets or environment.")
         st.stop()
 
-os.environ["TOGETHERAI_API_KEY"] = api_key
-os.environ["TOGETHER_API_KEY"] = api_key
+# The module reruns on every interaction; only touch the process environment when the key changes
+if os.environ.get("TOGETHER_API_KEY") != api_key or os.environ.get("TOGETHERAI_API_KEY") != api_key:
+    os.environ["TOGETHERAI_API_KEY"] = api_key
+    os.environ["TOGETHER_API_KEY"] = api_key
 API_BASE = None
 API_KEY = None
 
 
+@st.cache_resource(max_entries=64, show_spinner=False)
+def get_agent(model_name, notes_hash, _agent_notes, api_base, api_key):
+    """Build one agent per model and notes state, shared across reruns. The notes are keyed by their hash only"""
+    # Imported here so litellm and its dependencies load when the first study begins, not before the consent page
+    from collaborator_agent import CollaboratorAgent
+
+    kwargs = {
+        "model_name": model_name,
+    }
+    if _agent_notes:
+        kwargs["agent_notes"] = _agent_notes
+    if api_base and api_key:
+        kwargs["api_base"] = api_base
+        kwargs["api_key"] = api_key
+
+    return CollaboratorAgent(**kwargs)
+
+
+def _hash_notes(s: str) -> str:
+    """Short identity key for agent notes, so cache boundaries never hash the notes text themselves"""
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def get_agent_for_notes(agent_notes=None):
+    return get_agent(MODEL_NAME, _hash_notes(agent_notes or ""), agent_notes, API_BASE, API_KEY)
+
+
+@functools.lru_cache(maxsize=None)
+def _bulleted_prefs(study_key: str) -> str:
+    """The study's preferences as a markdown bullet list, built once per study"""
+    return "\n".join(f"- {pref}" for pref in STUDY_CONDITIONS[study_key].preferences)
+
+
+def _now_iso() -> str:
+    """Current local time as a second-resolution ISO 8601 string, used for every recorded timestamp"""
+    return datetime.now().isoformat(timespec="seconds")
+
+
 def init_session():
     """Initialize session state variables"""
-    if "page" not in st.session_state:
-        st.session_state.page = "intro"
-    
-    if "selected_study" not in st.session_state:
-        st.session_state.selected_study = None
+    ss = st.session_state
+    ss.setdefault("page", "intro")
+    ss.setdefault("selected_study", None)
+    ss.setdefault("current_problem_index", 0)
+    # Displayed chat history, only ever appended to and iterated; converted to a list once when the session is saved
+    ss.setdefault("messages", deque())
 
-    if "current_problem_index" not in st.session_state:
-        st.session_state.current_problem_index = 0
-    
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    
-    if "agent_notes" not in st.session_state:
-        st.session_state.agent_notes = ""
+    # The conversation as sent to the agent, kept in sync with messages by append_message
+    ss.setdefault("agent_conversation", [])
+
+    # Running summary of agent_conversation[:summarized_count], and the pending (summarized_count, future) update of it
+    ss.setdefault("context_summary", "")
+    ss.setdefault("summarized_count", 0)
+    ss.setdefault("summary_update", None)
+
+    ss.setdefault("agent_notes", "")
 
     # Track completed studies and store all data
-    if "completed_studies" not in st.session_state:
-        st.session_state.completed_studies = set()
+    ss.setdefault("completed_studies", set())
     
-    if "all_study_data" not in st.session_state:
-        st.session_state.all_study_data = {
+    # Explicit check rather than setdefault, which would draw a uuid4 and read the clock on every rerun
+    if "all_study_data" not in ss:
+        ss.all_study_data = {
             "participant_id": str(uuid.uuid4()), 
-            "overall_start_time": str(datetime.now()),
+            "overall_start_time": _now_iso(),
             "studies": []  # Will contain data from all 4 studies
         }
 
+    # Bumped whenever all_study_data changes, so its serialization in study_data_json is redone
+    ss.setdefault("data_version", 0)
+
+
+def append_message(role, content):
+    """Record a chat message, along with its agent-facing copy"""
+    st.session_state.messages.append({"role": role, "content": content, "timestamp": _now_iso()})
+    # Skip messages with empty/whitespace-only content to avoid Together AI validation errors
+    if content and content.strip():
+        st.session_state.agent_conversation.append({"role": role, "content": content.strip()})
+
 
 def show_study_selector():
     """Landing page to select which study condition to run"""
     st.title("🎓 Collaborative Agents Research Study")
     st.markdown("### Study Selection")
     
-    completed_count = len(st.session_state.completed_studies)
+    # Immutable snapshot of the completed studies, also the hashable input to the study buttons fragment
+    completed = frozenset(st.session_state.completed_studies)
+    completed_count = len(completed)
     total_count = len(STUDY_CONDITIONS)
     
     # Progress indicator
@@ -192,28 +156,34 @@ def show_study_selector():
     
     st.write("")
     
+    show_study_buttons(completed)
+    
+    st.divider()
+    st.caption(f"Complete all {total_count} studies to download your data.")
+
+
+@st.fragment
+def show_study_buttons(completed):
+    """One card per study condition. A fragment, so only the cards rerun until a study is started"""
     # Create buttons for each study condition
     for study_key, study_info in STUDY_CONDITIONS.items():
-        is_completed = study_key in st.session_state.completed_studies
+        is_completed = study_key in completed
         
         with st.container(border=True):
             col1, col2 = st.columns([3, 1])
             with col1:
                 status_icon = "✅" if is_completed else "⏳"
-                st.markdown(f"{status_icon} **{study_info['name']}**")
-                st.caption(study_info['description'])
+                st.markdown(f"{status_icon} **{study_info.name}**")
+                st.caption(study_info.description)
             with col2:
                 if is_completed:
                     st.success("Done")
                 else:
                     if st.button("Start", key=f"btn_{study_key}", type="primary"):
                         st.session_state.selected_study = study_key
-                        st.session_state.study_start_time = str(datetime.now())
+                        st.session_state.study_start_time = _now_iso()
                         st.session_state.page = "study_intro"
-                        st.rerun()
-    
-    st.divider()
-    st.caption(f"Complete all {total_count} studies to download your data.")
+                        st.rerun(scope="app")
 
 
 def show_intro_page():
@@ -268,7 +238,7 @@ def show_study_intro_page():
     config = STUDY_CONDITIONS[st.session_state.selected_study]
     
     st.title("🎓 Collaborative Agents Study")
-    st.markdown(f"#### {config['name']}")
+    st.markdown(f"#### {config.name}")
     
     # Display preferences in a highlighted container
     with st.container(border=True):
@@ -276,7 +246,7 @@ def show_study_intro_page():
         st.markdown("For this study, please adopt the following preferences (you will be able to see these throughout the sessions):")
         st.write("")
 
-        for i, pref in enumerate(config["preferences"], 1):
+        for i, pref in enumerate(config.preferences, 1):
             st.markdown(f"**{i}.** {pref}")
         st.markdown(f"Feel free to apply any additional preferences of your own that help you with solving the problem.")
 
@@ -294,17 +264,7 @@ def show_study_intro_page():
     with col2:
         if st.button("Begin Study →", type="primary"):
             # Initialize agent for this study
-            user_prefs_text = "\n".join([f"{i+1}. {pref}" for i, pref in enumerate(config["preferences"])])
-            
-            kwargs = {
-                "model_name": MODEL_NAME,
-                # "user_preferences": user_prefs_text,
-            }
-            if API_BASE and API_KEY:
-                kwargs["api_base"] = API_BASE
-                kwargs["api_key"] = API_KEY
-            
-            st.session_state.agent = CollaboratorAgent(**kwargs)
+            st.session_state.agent = get_agent_for_notes()
             st.session_state.page = "study"
             st.rerun()
 
@@ -312,7 +272,7 @@ def show_study_intro_page():
 def show_study_interface():
     """Main study interface with chat"""
     config = STUDY_CONDITIONS[st.session_state.selected_study]
-    problems = config["problems"]
+    problems = config.problems
     
     if st.session_state.current_problem_index >= len(problems):
         # Study complete, go to survey for last session
@@ -328,15 +288,19 @@ def show_study_interface():
         st.progress((st.session_state.current_problem_index) / len(problems))
         st.divider()
         st.warning("REMEMBER YOUR PREFERENCES:")
-        for pref in config["preferences"]:
-            st.caption(f"- {pref}")
+        st.caption(_bulleted_prefs(st.session_state.selected_study))
         st.divider()
 
         # Reminder before completing task
         st.info("⚠️ Before completing: Did you verify that all your preferences were adhered to?")
         
-        # Moves to Survey Page (Doesn't save data yet)
-        if st.button("✅ Task Complete", type="primary"):
+        # Moves to Survey Page (Doesn't save data yet). Submitted as a form, so completing the task is a single rerun
+        with st.form("complete_form", clear_on_submit=False, border=False):
+            task_complete = st.form_submit_button("✅ Task Complete", type="primary")
+        if task_complete:
+            # Start updating the agent notes now, so the LLM call runs while the participant fills out the survey
+            if config.uses_memory:
+                st.session_state.notes_update = start_agent_notes_update()
             st.session_state.page = "survey"
             st.rerun()
 
@@ -345,10 +309,16 @@ def show_study_interface():
     
     # Display problem description with proper formatting
     with st.container(border=True):
-        st.markdown("**Task: Please solve the problem below by communicating with the agent. Remember, they do not see this problem description.** Avoid copy and pasting, unless you have to (e.g. the problem provides a code snippet or paragraph you need to change).")
-        st.markdown(current_problem['description'])
+        st.markdown(current_problem["task_markdown"])
+
+    show_chat_panel()
 
-    # Display History
+
+@st.fragment
+def show_chat_panel():
+    """Chat history and input. A fragment, so sending a message only reruns this part of the page"""
+    # Display History. Every run has to emit the full history: elements not written in a run are removed from the
+    # page, so rendering only the new messages would erase the old ones. The frontend diffs the unchanged ones
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
@@ -356,31 +326,77 @@ def show_study_interface():
     # Handle Input
     if prompt := st.chat_input("Type here..."):
         # User message
-        st.session_state.messages.append({"role": "user", "content": prompt, "timestamp": str(datetime.now())})
+        append_message("user", prompt)
         with st.chat_message("user"):
             st.markdown(prompt)
 
         # Agent message
+        agent = st.session_state.agent
+        conversation = get_agent_context()
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                # Build conversation for agent (include history for context)
-                # Filter out messages with empty/whitespace-only content to avoid Together AI validation errors
-                conversation = [{"role": msg["role"], "content": msg["content"].strip()} 
-                               for msg in st.session_state.messages 
-                               if "role" in msg and "content" in msg 
-                               and msg["content"] and msg["content"].strip()]
-                
-                # Get response from agent
-                result = st.session_state.agent.generate_collaborator_response(conversation)
-                
-                if result and "response" in result:
-                    response_text = result["response"]
-                else:
+                # Stream the response from the agent as it is generated (include history for context)
+                placeholder = st.empty()
+                try:
+                    with placeholder.container():
+                        response_text = st.write_stream(agent.generate_collaborator_response_stream(conversation))
+                except Exception as e:
+                    # The stream was cut off, so replace the partial reply with a complete one
+                    print(f"Streaming response failed, falling back to a full response: {e}")
+                    placeholder.empty()
+                    try:
+                        result = agent.generate_collaborator_response(conversation)
+                    except Exception as e:
+                        print(f"Fallback response failed: {e}")
+                        result = None
+                    response_text = result["response"] if result and "response" in result else ""
+                    if response_text:
+                        st.markdown(response_text)
+
+                if not response_text:
                     response_text = "I apologize, but I'm having trouble generating a response. Could you please try rephrasing your question?"
-                
-                st.markdown(response_text)
-        
-        st.session_state.messages.append({"role": "assistant", "content": response_text, "timestamp": str(datetime.now())})
+                    st.markdown(response_text)
+
+        append_message("assistant", response_text)
+        start_context_summary()
+
+
+def get_agent_context():
+    """The conversation sent to the agent: the summary of older messages followed by every unsummarized one"""
+    if not SUMMARIZE_CONTEXT:
+        return st.session_state.agent_conversation
+    if st.session_state.summary_update is not None and st.session_state.summary_update[1].done():
+        summarized_count, summary_future = st.session_state.summary_update
+        st.session_state.summary_update = None
+        summary = summary_future.result()
+        if summary:
+            st.session_state.context_summary = summary
+            st.session_state.summarized_count = summarized_count
+
+    conversation = st.session_state.agent_conversation[st.session_state.summarized_count:]
+    if st.session_state.context_summary:
+        conversation = [{"role": "system", "content": f"Summary of the earlier conversation:\n{st.session_state.context_summary}"}] + conversation
+    return conversation
+
+
+def start_context_summary():
+    """Fold all but the last MAX_CONTEXT_TURNS messages into the summary once enough have accumulated"""
+    if not SUMMARIZE_CONTEXT or st.session_state.summary_update is not None:
+        return
+    summarized_count = st.session_state.summarized_count
+    end = len(st.session_state.agent_conversation) - MAX_CONTEXT_TURNS
+    if end - summarized_count < SUMMARY_EVERY:
+        return
+    summary_future = st.session_state.agent.submit_summarize_conversation(
+        st.session_state.context_summary, st.session_state.agent_conversation[summarized_count:end]
+    )
+    st.session_state.summary_update = (end, summary_future)
+
+
+def start_agent_notes_update():
+    """Start updating the agent notes with the current session's conversation, returning a future for the result"""
+    agent_notes = st.session_state.agent_notes or "Initial notes: No preferences learned yet."
+    return st.session_state.agent.submit_update_agent_notes(agent_notes, list(st.session_state.agent_conversation))
 
 
 def show_survey_interface():
@@ -472,50 +488,35 @@ def show_survey_interface():
         
         if submitted:
             config = STUDY_CONDITIONS[st.session_state.selected_study]
-            current_problem = config["problems"][st.session_state.current_problem_index]
+            current_problem = config.problems[st.session_state.current_problem_index]
             
             # Save agent notes before update
             agent_notes_before = st.session_state.agent_notes
             
             # Update agent memory if this is a collaborative condition
-            if config["uses_memory"]:
-                conversation = [{"role": msg["role"], "content": msg["content"]} 
-                              for msg in st.session_state.messages 
-                              if "role" in msg and "content" in msg]
-                
-                # Update agent notes
-                if st.session_state.agent_notes:
-                    result = st.session_state.agent.update_agent_notes(st.session_state.agent_notes, conversation)
-                else:
-                    result = st.session_state.agent.update_agent_notes(
-                        "Initial notes: No preferences learned yet.",
-                        conversation
-                    )
+            if config.uses_memory:
+                # Update agent notes, normally already started when the participant clicked Task Complete
+                notes_update = st.session_state.pop("notes_update", None)
+                if notes_update is None:
+                    notes_update = start_agent_notes_update()
+                result = notes_update.result()
                 
                 # Get updated agent notes
                 if result and "agent_notes" in result:
-                    st.session_state.agent_notes = result["agent_notes"]
-                    
-                    # Reinitialize agent with updated notes
-                    user_prefs_text = "\n".join([f"{i+1}. {pref}" for i, pref in enumerate(config["preferences"])])
-                    kwargs = {
-                        "model_name": MODEL_NAME,
-                        "agent_notes": st.session_state.agent_notes,
-                    }
-                    if API_BASE and API_KEY:
-                        kwargs["api_base"] = API_BASE
-                        kwargs["api_key"] = API_KEY
-                    
-                    st.session_state.agent = CollaboratorAgent(**kwargs)
+                    # Reinitialize agent only if the notes actually changed; agents are cached per notes state
+                    if result["agent_notes"] != st.session_state.agent_notes:
+                        st.session_state.agent_notes = result["agent_notes"]
+                        st.session_state.agent = get_agent_for_notes(st.session_state.agent_notes)
             
             agent_notes_after = st.session_state.agent_notes
             
-            # Create session record
+            # Create session record; one timestamp marks the submission everywhere it is recorded
+            submitted_at = _now_iso()
             session_record = {
                 "session_index": st.session_state.current_problem_index,
                 "problem_id": current_problem['id'],
                 "problem_title": current_problem['title'],
-                "chat_history": st.session_state.messages,
+                "chat_history": list(st.session_state.messages),
                 "agent_notes_before": agent_notes_before,
                 "agent_notes_after": agent_notes_after,
                 "survey_responses": {
@@ -526,7 +527,7 @@ def show_survey_interface():
                     "q_satisfaction": q_sat,
                     "q5_memorable_moments": q5
                 },
-                "timestamp": str(datetime.now())
+                "timestamp": submitted_at
             }
             
             # Store session data temporarily
@@ -536,22 +537,29 @@ def show_survey_interface():
             
             # Move to next session
             st.session_state.current_problem_index += 1
-            st.session_state.messages = []
+            st.session_state.messages = deque()
+            st.session_state.agent_conversation = []
+            st.session_state.context_summary = ""
+            st.session_state.summarized_count = 0
+            st.session_state.summary_update = None
             
             # Check if this study is complete (all 3 sessions done)
-            if st.session_state.current_problem_index >= len(config["problems"]):
+            if st.session_state.current_problem_index >= len(config.problems):
                 # Save completed study data
                 study_record = {
                     "study_condition": st.session_state.selected_study,
-                    "study_name": config["name"],
-                    "start_time": st.session_state.get("study_start_time", str(datetime.now())),
-                    "end_time": str(datetime.now()),
-                    "assigned_preferences": config["preferences"],
-                    "uses_memory": config["uses_memory"],
+                    "study_name": config.name,
+                    "start_time": st.session_state.get("study_start_time", submitted_at),
+                    "end_time": submitted_at,
+                    "assigned_preferences": list(config.preferences),
+                    "uses_memory": config.uses_memory,
+                    "summarized_context": SUMMARIZE_CONTEXT,
+                    "agent_prompt_version": AGENT_PROMPT_VERSION,
                     "sessions": st.session_state.current_study_sessions
                 }
                 
                 st.session_state.all_study_data["studies"].append(study_record)
+                st.session_state.data_version += 1
                 st.session_state.completed_studies.add(st.session_state.selected_study)
                 
                 # Reset for next study
@@ -569,6 +577,16 @@ def show_survey_interface():
             st.rerun()
 
 
+def serialize_study_data():
+    """Serialize this session's study data, reusing the last serialization until data_version changes"""
+    ss = st.session_state
+    version, json_bytes = ss.get("study_data_json", (None, None))
+    if version != ss.data_version:
+        json_bytes = orjson.dumps(ss.all_study_data, option=orjson.OPT_INDENT_2)
+        ss.study_data_json = (ss.data_version, json_bytes)
+    return json_bytes
+
+
 def show_final_download_page():
     """Final page with data download"""
     st.balloons()
@@ -579,20 +597,21 @@ def show_final_download_page():
     Please download your session data below and send it to the study coordinator.
     """)
     
-    # Convert the Python dictionary to a JSON string
-    json_string = json.dumps(st.session_state.all_study_data, indent=4)
+    # Convert the Python dictionary to JSON bytes
+    json_bytes = serialize_study_data()
     
     # Create the Download Button
     st.download_button(
         label="📥 Download Study JSON",
-        data=json_string,
+        data=json_bytes,
         file_name=f"study_data_{st.session_state.all_study_data['participant_id']}.json",
         mime="application/json"
     )
 
-    # Optional: Display what's in the file so they trust it
-    with st.expander("View Data Preview"):
-        st.json(st.session_state.all_study_data)
+    # Optional: Display what's in the file so they trust it. Only sent to the browser when asked for, and
+    # rendered from the already serialized download rather than the dict
+    if st.checkbox("Show data preview"):
+        st.json(json_bytes.decode("utf-8"))
     
     st.divider()
     
@@ -0,0 +1,131 @@
+"""
+Study conditions used by full_human_study.py. They live in their own module so that Streamlit's
+script reruns reuse the imported objects instead of rebuilding them on every interaction.
+"""
+
+from dataclasses import dataclass
+
+
+# ============================================================================
+# STUDY CONFIGURATIONS
+# ============================================================================
+
+
+@dataclass(frozen=True, slots=True)
+class StudyCondition:
+    name: str
+    description: str
+    uses_memory: bool
+    preferences: tuple[str, ...]
+    problems: tuple[dict, ...]
+
+
+TASK_INSTRUCTIONS = "**Task: Please solve the problem below by communicating with the agent. Remember, they do not see this problem description.** Avoid copy and pasting, unless you have to (e.g. the problem provides a code snippet or paragraph you need to change)."
+
+
+def make_problem(id, title, description):
+    """A problem entry, with the full task text shown to the participant assembled once here"""
+    return {
+        "id": id,
+        "title": title,
+        "description": description,
+        "task_markdown": f"{TASK_INSTRUCTIONS}\n\n{description}"
+    }
+
+
+CODING_PREFERENCES = (
+    "When an agent is writing code or explaining a programming concept, you prefer responses that begin with pseudocode (e.g., high-level idea, design rationale) before showing going into implementation details.",
+    "If multiple high-level, valid solutions exist for a coding problem (recursion vs. dynamic programming), then you would prefer the agent to present the different approaches and their tradeoffs.",
+    "If the code solution requires extensive use of an imported library, the agent should always provide an explanation detailing why the dependency is helpful.",
+    "When writing variable names, function names, or method names, you prefer that the agent consistently use camelCase rather than other naming conventions."
+)
+
+CODING_PROBLEMS = (
+    make_problem(
+        id="p1",
+        title="Session 1",
+        description="""**Problem #1:**
+
+The function below is intended to walk a directory tree and collect files whose names match a pattern. It always returns an empty list. Can you fix it and/or find a cleaner way to implement it?
+
+```python
+import os
+
+def scan_dir(path, pattern):
+    curr_results = []
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            if f.endswith(pattern):
+                curr_results = curr_results.append(os.path.join(root, f))
+    return curr_results
+```
+"""
+    ),
+    make_problem(
+        id="p2",
+        title="Session 2",
+        description="Write a function that resizes an image, converts it to grayscale, and saves it."
+    ),
+    make_problem(
+        id="p3",
+        title="Session 3",
+        description="You are implementing an object-oriented program to help students plan their coursework each semester. Your program must support checking whether a student has completed all prerequisites for a course, where some prerequisites include a minimum completion date. You should use the `dateutil` library to parse and compare dates."
+    )
+)
+
+MIXED_PREFERENCES = (
+    "When producing an answer, you prefer responses that begin with a high-level plan before showing concrete revisions, implementations, solutions, or rewritten text. This plan should outline the conceptual strategy, structural intent, and major steps the agent will take.",
+    "If multiple high-level, valid strategies exist for completing a task, you prefer that the agent first present these different approaches along with their tradeoffs. The agent should briefly explain how each strategy would shape the outcome and then ask which direction you want to pursue before producing any detailed edits or solutions."
+)
+
+MIXED_PROBLEMS = (
+    make_problem(
+        id="p1",
+        title="Session 1",
+        description="""Add a plot twist to the paragraph below, but make sure the twist (e.g., character-based, setting-based, or perspective-based) integrates smoothly with the existing setup. The twist should feel motivated rather than sudden or random.
+
+`Nora stood waiting at the empty bus stop, the cold wind tugging at her coat as she checked the time again. The streetlamps flickered in uneven intervals, casting long shadows across the pavement. Behind her, the small bakery she had just left was closing for the night, its warm lights dimming one by one. The bus was already ten minutes late, and the neighborhood felt unusually deserted for a Thursday evening.`"""
+    ),
+    make_problem(
+        id="p2",
+        title="Session 2",
+        description="How many ways are there to put 4 distinguishable balls into 2 indistinguishable boxes?"
+    ),
+    make_problem(
+        id="p3",
+        title="Session 3",
+        description="Write a function that resizes an image, converts it to grayscale, and saves it."
+    )
+)
+
+# Study condition configurations
+STUDY_CONDITIONS: dict[str, StudyCondition] = {
+    "coding_standard_agent": StudyCondition(
+        name="Coding Study - Version A",
+        description="You will be solving debugging, implementation, and object-oriented design problems.",
+        uses_memory=False,
+        preferences=CODING_PREFERENCES,
+        problems=CODING_PROBLEMS
+    ),
+    "coding_collaborative_agent": StudyCondition(
+        name="Coding Study - Version B",
+        description="You will be solving debugging, implementation, and object-oriented design problems.",
+        uses_memory=True,
+        preferences=CODING_PREFERENCES,
+        problems=CODING_PROBLEMS
+    ),
+    "mixed_standard_agent": StudyCondition(
+        name="Mixed Domains Study - Version A",
+        description="You will be solving a writing, math, and coding problems.",
+        uses_memory=False,
+        preferences=MIXED_PREFERENCES,
+        problems=MIXED_PROBLEMS
+    ),
+    "mixed_collaborative_agent": StudyCondition(
+        name="Mixed Domains Study - Version B",
+        description="You will be solving a writing, math, and coding problems.",
+        uses_memory=True,
+        preferences=MIXED_PREFERENCES,
+        problems=MIXED_PROBLEMS
+    )
+}